@@ -0,0 +1,38 @@
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from Extract_Text import extract_page_range, extract_pages_parallel
+
+# Sequential vs. parallel page extraction on the first N pages of a PDF.
+# Usage: python Benchmark_Extraction.py path/to/pack.pdf [workers]
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+if __name__ == "__main__":
+    pdf_path = sys.argv[1]
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+
+    import pdfplumber
+
+    with pdfplumber.open(pdf_path) as pdf:
+        total_pages = len(pdf.pages)
+
+    page_counts = sorted({n for n in (1, 2, 4, 8, 12, 16, 32, 60, total_pages) if n <= total_pages})
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        # Start the workers before timing anything
+        extract_pages_parallel(pdf_path, executor, min(workers, total_pages), workers)
+
+        print(f"{'pages':>6} {'sequential s':>13} {'parallel s':>11} {'speedup':>8}")
+        for page_count in page_counts:
+            seq_time, seq_pages = timed(extract_page_range, pdf_path, 0, page_count)
+            par_time, par_pages = timed(extract_pages_parallel, pdf_path, executor, page_count, workers)
+            assert seq_pages == par_pages, "parallel extraction changed the output"
+            print(f"{page_count:>6} {seq_time:>13.2f} {par_time:>11.2f} {seq_time / par_time:>7.2f}x")
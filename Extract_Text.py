@@ -1,16 +1,66 @@
-import pdfplumber
 import logging
+import os
 import re
 # Hide pdfminer warnings
 logging.getLogger("pdfminer").setLevel(logging.ERROR)
 
 def extract_text_from_pdf(pdf_path):
+    import pdfplumber  # imported lazily, it is slow to load
+
     text = ""
     with pdfplumber.open(pdf_path) as pdf:
         for page in pdf.pages:
             text += page.extract_text() + "\n"
     return text
 
+BLOCK_GAP_RATIO = 1.0  # a vertical gap taller than a line starts a new layout block
+
+# Below this many pages, starting worker processes costs more than it saves
+PARALLEL_MIN_PAGES = int(os.environ.get("PARALLEL_MIN_PAGES", 12))
+
+
+def extract_page_blocks(page):
+    """Split a pdfplumber page into layout blocks separated by vertical gaps"""
+    if not hasattr(page, "extract_text_lines"):  # pdfplumber < 0.10
+        page_text = page.extract_text()
+        return [page_text] if page_text else []
+
+    blocks = []
+    current = []
+    prev_bottom = None
+    for line in page.extract_text_lines():
+        height = max(line["bottom"] - line["top"], 1)
+        if current and line["top"] - prev_bottom > height * BLOCK_GAP_RATIO:
+            blocks.append("\n".join(current))
+            current = []
+        current.append(line["text"])
+        prev_bottom = line["bottom"]
+    if current:
+        blocks.append("\n".join(current))
+    return blocks
+
+
+def extract_page_range(pdf_path, start, stop):
+    """Worker entry point: open the PDF and extract blocks for pages [start, stop)"""
+    import pdfplumber
+
+    with pdfplumber.open(pdf_path) as pdf:
+        return [extract_page_blocks(page) for page in pdf.pages[start:stop]]
+
+
+def extract_pages_parallel(pdf_path, executor, page_count, workers):
+    """Split pages into one contiguous range per worker and merge results in page order"""
+    chunk = -(-page_count // workers)  # ceil
+    futures = [
+        executor.submit(extract_page_range, pdf_path, start, min(start + chunk, page_count))
+        for start in range(0, page_count, chunk)
+    ]
+    pages = []
+    for future in futures:
+        pages.extend(future.result())
+    return pages
+
+
 def remove_arabic_text(text):
     arabic_pattern = re.compile(r"[\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF\uFB50-\uFDFF\uFE70-\uFEFF]+")
     return re.sub(arabic_pattern, "", text)
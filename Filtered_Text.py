@@ -1,17 +1,16 @@
 import re
-import pdfplumber
-import anthropic
 import logging
 import json
 from Extract_Text import extract_text_from_pdf
 from Extract_Text import remove_arabic_text# Hide pdfminer warnings
 from Extract_Text import clean_text# Hide pdfminer warnings
-from playwright.sync_api import sync_playwright
 
 logging.getLogger("pdfminer").setLevel(logging.ERROR)
 
 
 def call_claude_api(cleaned_text, api_key):
+    import anthropic  # imported lazily, it is slow to load
+
     client = anthropic.Anthropic(api_key=api_key)
 
     prompt = f"""
@@ -141,6 +140,8 @@ if __name__ == "__main__":
             print(f"Graduation Date: '{graduation_date}'")
 
             #Automation
+            from playwright.sync_api import sync_playwright
+
             with sync_playwright() as p:
                 browser = p.chromium.launch(headless=False)  # set headless=True to run without UI
                 page = browser.new_page()
@@ -180,6 +181,8 @@ if __name__ == "__main__":
                 page.wait_for_selector("#field167776220")
                 page.fill("#field167776220", mobile_numbers)
 
+                # Nothing left to wait on; the sleep only keeps the filled form on screen
+                logging.warning("Performance: fixed 2000ms sleep to keep the filled form visible")
                 page.wait_for_timeout(2000)  # waits 2 seconds (milliseconds!)
 
                 
@@ -1,45 +1,371 @@
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException
 from fastapi.responses import JSONResponse, HTMLResponse
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 import re
-import pdfplumber
-import anthropic
 import logging
 import json
 import tempfile
 import asyncio
-from playwright.async_api import async_playwright
+import hashlib
+import time
+import uuid
+import threading
+import importlib
+from contextlib import asynccontextmanager
+from collections import deque, defaultdict
+import traceback
 import uvicorn
 from pathlib import Path
 import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from Extract_Text import PARALLEL_MIN_PAGES, extract_page_blocks, extract_pages_parallel
+
+try:
+    import fcntl  # POSIX only; cross-worker locking is skipped without it
+except ImportError:
+    fcntl = None
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Student Info Extractor API")
+
+# === Lazy heavy imports ===
+# pdfplumber, anthropic and playwright take most of the cold-start time, so they
+# are imported on first use (or preloaded by the lifespan hook) instead of here.
+HEAVY_MODULES = ("pdfplumber", "anthropic", "playwright.async_api")
+
+startup_profile: Dict[str, Any] = {"imports": {}, "errors": {}, "warmup_seconds": None, "ready": False}
+
+
+def load_module(name: str):
+    """Import a heavy module on first use and record how long it took"""
+    imports = startup_profile["imports"]
+    if name in imports:
+        return importlib.import_module(name)
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    imports[name] = round(time.perf_counter() - start, 4)
+    logger.info(f"Imported {name} in {imports[name]:.3f}s")
+    return module
+
+
+def async_playwright():
+    return load_module("playwright.async_api").async_playwright()
+
+
+async def warm_up():
+    """Preload heavy modules off the event loop; ready only if all of them import"""
+    start = time.perf_counter()
+    errors = startup_profile["errors"]
+    if os.environ.get("PRELOAD_HEAVY_IMPORTS", "1") != "0":
+        for name in HEAVY_MODULES:
+            try:
+                await asyncio.to_thread(load_module, name)
+            except Exception as e:
+                logger.error(f"Warm-up failed to import {name}: {e}")
+                errors[name] = str(e)
+    startup_profile["warmup_seconds"] = round(time.perf_counter() - start, 4)
+    startup_profile["ready"] = not errors
+    logger.info(f"Startup profile: {startup_profile}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in the background so /health answers while modules load
+    warm_up_task = asyncio.create_task(warm_up())
+    sweep_task = asyncio.create_task(extraction_flight.sweep_periodically())
+    yield
+    warm_up_task.cancel()
+    sweep_task.cancel()
+    if _extraction_pool is not None:
+        _extraction_pool.shutdown(cancel_futures=True)
+
+
+app = FastAPI(title="Student Info Extractor API", lifespan=lifespan)
 
 class FillFormRequest(BaseModel):
     student_data: Dict[str, Any]
     agent_name: str
 
+
+# Bump whenever the extraction prompt changes so old in-flight results are not shared
+PROMPT_VERSION = "2024-10-22.2"
+
+
+# === Single-flight ===
+class _LeaderCancelled(Exception):
+    """The call followers were waiting on was cancelled; they run it themselves"""
+
+
+class SingleFlight:
+    """Collapse concurrent identical calls into one computation.
+
+    Within a worker, callers with the same key await the same future. Across
+    workers, an flock() on a file in `lock_dir` serialises the computation and
+    the leader leaves its result next to the lock for the waiting workers, who
+    register a `.wait` marker so the last one to read it can delete it.
+    """
+
+    RESULT_TTL = 60  # seconds before leftover lock/result files are swept
+    POLL_INTERVAL = 0.05
+
+    def __init__(self, lock_dir: str):
+        self.lock_dir = Path(lock_dir)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {"computations": 0, "duplicates_suppressed": 0}
+
+    async def do(self, key: str, fn):
+        """Run `fn()` for `key` unless an identical call is already in flight"""
+        fut = self._inflight.get(key)
+        if fut is not None:
+            self.stats["duplicates_suppressed"] += 1
+            logger.info(f"Joining in-flight extraction {key[:12]}")
+            try:
+                return await asyncio.shield(fut)
+            except _LeaderCancelled:
+                # Only the leader's client went away; the first follower takes over
+                self.stats["duplicates_suppressed"] -= 1
+                return await self.do(key, fn)
+
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            result = await self._run_locked(key, fn)
+        except asyncio.CancelledError:
+            fut.set_exception(_LeaderCancelled())
+            fut.exception()
+            raise
+        except Exception as e:
+            fut.set_exception(e)
+            fut.exception()  # mark retrieved when nobody else was waiting
+            raise
+        else:
+            fut.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _run_locked(self, key: str, fn):
+        if fcntl is None:
+            self.stats["computations"] += 1
+            return await fn()
+
+        self.lock_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+        result_path = self.lock_dir / f"{key}.json"
+        started = time.time()
+        # Registered before queueing so the lock holder knows the result is still wanted
+        marker = self.lock_dir / f"{key}.{uuid.uuid4().hex}.wait"
+        marker.touch()
+        try:
+            fd, contended = await self._acquire(self.lock_dir / f"{key}.lock", marker)
+            try:
+                marker.unlink(missing_ok=True)
+                if contended:
+                    shared = self._read_result(result_path, started)
+                    if shared is not None:
+                        self.stats["duplicates_suppressed"] += 1
+                        logger.info(f"Reusing extraction {key[:12]} from another worker")
+                        self._drop_result_if_unwanted(key, result_path)
+                        return shared
+
+                self.stats["computations"] += 1
+                result = await fn()
+                self._write_result(result_path, result)
+                self._drop_result_if_unwanted(key, result_path)
+                return result
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
+        finally:
+            marker.unlink(missing_ok=True)
+            self.sweep()
+
+    async def _acquire(self, lock_path: Path, marker: Path):
+        """Take the flock on `lock_path`, returning (fd, whether we had to wait)
+
+        While queued, `marker` is touched regularly so sweep() never mistakes a
+        long wait (large PDF + Claude) for an abandoned one.
+        """
+        contended = False
+        refreshed = time.monotonic()
+        while True:
+            fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                # Poll rather than block in a thread so a cancelled request never holds the lock
+                while True:
+                    try:
+                        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        break
+                    except BlockingIOError:
+                        contended = True
+                        if time.monotonic() - refreshed > self.RESULT_TTL / 3:
+                            marker.touch()
+                            refreshed = time.monotonic()
+                        await asyncio.sleep(self.POLL_INTERVAL)
+                # sweep() may have unlinked the file while we were queued on it
+                try:
+                    current = os.fstat(fd).st_ino == os.stat(lock_path).st_ino
+                except FileNotFoundError:
+                    current = False
+            except BaseException:
+                os.close(fd)
+                raise
+            if current:
+                return fd, contended
+            os.close(fd)
+
+    @staticmethod
+    def _read_result(path: Path, not_before: float):
+        """Return a result finished after `not_before`, i.e. by a call we were waiting on"""
+        try:
+            payload = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None
+        if payload.get("finished_at", 0) < not_before:
+            return None
+        return payload.get("result")
+
+    @staticmethod
+    def _write_result(path: Path, result):
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps({"finished_at": time.time(), "result": result}))
+        os.replace(tmp_path, path)
+
+    def _drop_result_if_unwanted(self, key: str, path: Path):
+        """Delete the shared result (student data) once no queued worker is waiting for it.
+
+        Only called while holding the key's lock, so no waiter can read it concurrently.
+        """
+        if not any(self.lock_dir.glob(f"{key}.*.wait")):
+            path.unlink(missing_ok=True)
+
+    def sweep(self):
+        """Remove files left behind by crashed or abandoned calls"""
+        if fcntl is None or not self.lock_dir.exists():
+            return
+        cutoff = time.time() - self.RESULT_TTL
+        for path in self.lock_dir.iterdir():
+            try:
+                if path.stat().st_mtime >= cutoff:
+                    continue
+                if path.suffix == ".lock":
+                    self._unlink_idle_lock(path)
+                elif path.suffix in (".json", ".tmp", ".wait"):
+                    path.unlink()
+            except OSError:
+                pass
+
+    @staticmethod
+    def _unlink_idle_lock(path: Path):
+        fd = os.open(path, os.O_RDWR)
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return  # still in use
+            path.unlink()
+        finally:
+            os.close(fd)
+
+    async def sweep_periodically(self):
+        """Clean up even when no further requests arrive"""
+        while True:
+            await asyncio.sleep(self.RESULT_TTL)
+            await asyncio.to_thread(self.sweep)
+
+
+def extraction_key(content: bytes, api_key: str) -> str:
+    """Single-flight key: same file, prompt and API key (failures are per key)"""
+    digest = hashlib.sha256(content)
+    digest.update(PROMPT_VERSION.encode())
+    digest.update(hashlib.sha256(api_key.encode()).digest())
+    return digest.hexdigest()
+
+
+extraction_flight = SingleFlight(
+    os.environ.get("SINGLE_FLIGHT_DIR", os.path.join(tempfile.gettempdir(), "student_extractor_flight"))
+)
+
 # === Utility Functions ===
-def extract_text_from_pdf(pdf_file):
-    """Extract text from PDF file"""
-    text = ""
+def default_extraction_workers(cap: int = 4) -> int:
+    """CPUs this process may actually run on (not the host's), capped"""
+    try:
+        available = len(os.sched_getaffinity(0))
+    except AttributeError:  # not available on macOS/Windows
+        available = os.cpu_count() or 1
+    return max(1, min(available, cap))
+
+
+EXTRACTION_WORKERS = int(os.environ.get("EXTRACTION_WORKERS", default_extraction_workers()))
+_extraction_pool: Optional[ProcessPoolExecutor] = None
+_extraction_pool_lock = threading.Lock()  # extraction runs in to_thread workers
+
+
+def get_extraction_pool() -> ProcessPoolExecutor:
+    """Process pool for large PDFs, started on first use"""
+    global _extraction_pool
+    with _extraction_pool_lock:
+        if _extraction_pool is None:
+            # spawn, not fork: the server process runs threads (uvicorn, playwright)
+            _extraction_pool = ProcessPoolExecutor(
+                max_workers=EXTRACTION_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _extraction_pool
+
+
+def reset_extraction_pool(broken: ProcessPoolExecutor):
+    """Drop a pool whose worker died (e.g. OOM-killed) so the next large PDF gets a fresh one"""
+    global _extraction_pool
+    with _extraction_pool_lock:
+        if _extraction_pool is broken:
+            _extraction_pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def extract_pages_from_pdf(pdf_file) -> List[List[str]]:
+    """Extract the layout blocks of every page (empty list for blank pages)"""
+    pdfplumber = load_module("pdfplumber")
     try:
         with pdfplumber.open(pdf_file) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
-        return text
+            page_count = len(pdf.pages)
+            if page_count < PARALLEL_MIN_PAGES or EXTRACTION_WORKERS < 2:
+                return [extract_page_blocks(page) for page in pdf.pages]
+
+        pool = None
+        try:
+            pool = get_extraction_pool()
+            logger.info(f"Extracting {page_count} pages across {EXTRACTION_WORKERS} processes")
+            return extract_pages_parallel(pdf_file, pool, page_count, EXTRACTION_WORKERS)
+        except Exception as e:
+            # Pool failures are ours, not the file's: retry in-process, which also
+            # re-raises genuine parse errors below as a 400
+            logger.error(f"Parallel extraction failed ({e!r}); falling back to sequential")
+            if isinstance(e, BrokenProcessPool) and pool is not None:
+                reset_extraction_pool(pool)
+
+        with pdfplumber.open(pdf_file) as pdf:
+            return [extract_page_blocks(page) for page in pdf.pages]
+    except MemoryError:
+        raise
     except Exception as e:
         logger.error(f"PDF extraction error: {e}")
         raise HTTPException(status_code=400, detail=f"Failed to extract text from PDF: {str(e)}")
 
 
+def pages_to_text(pages: List[List[str]]) -> str:
+    return "".join("\n".join(blocks) + "\n" for blocks in pages if blocks)
+
+
+def extract_text_from_pdf(pdf_file):
+    """Extract text from PDF file"""
+    return pages_to_text(extract_pages_from_pdf(pdf_file))
+
+
 def remove_arabic_text(text):
     """Remove Arabic text from content"""
     arabic_pattern = re.compile(r"[\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF\uFB50-\uFDFF\uFE70-\uFEFF]+")
@@ -54,9 +380,138 @@ def clean_text(text):
     return text.strip()
 
 
+# === Page text index ===
+# Keywords recorded per layout block. Order matters: the index stores hits as a
+# bitmask over this tuple.
+INDEX_KEYWORDS = (
+    "passport", "surname", "given name", "date of birth", "place of birth", "nationality", "sex", "gender",
+    "ielts", "test report form", "overall band",
+    "school", "certificate", "qualification", "secondary", "graduat",
+    "mobile", "phone", "e-mail", "email", "address",
+)
+_PREFIX_KEYWORDS = {"graduat"}  # graduate, graduated, graduation
+
+
+def _keyword_pattern(keyword: str) -> str:
+    # Whole words (plural allowed) so "sex" skips "Essex" and "school" skips "Schooling"
+    suffix = "" if keyword in _PREFIX_KEYWORDS else r"(?:e?s)?\b"
+    return r"\b" + re.escape(keyword) + suffix
+
+
+# One named group per keyword: IGNORECASE also matches e.g. "İ" or "ſ", whose
+# lower() is not the ASCII keyword, so hits are mapped back by group name
+_KEYWORD_RE = re.compile(
+    "|".join(f"(?P<k{i}>{_keyword_pattern(k)})" for i, k in enumerate(INDEX_KEYWORDS)), re.IGNORECASE
+)
+_KEYWORD_BITS = {k: 1 << i for i, k in enumerate(INDEX_KEYWORDS)}
+
+# Fields requested in the Claude prompt and the keywords whose blocks can answer them
+FIELD_KEYWORDS = {
+    "First name": ("passport", "surname", "given name"),
+    "Middle name": ("passport", "surname", "given name"),
+    "Last name": ("passport", "surname", "given name"),
+    "Gender": ("sex", "gender"),
+    "Date of Birth": ("date of birth",),
+    "Nationality": ("nationality",),
+    "Place of Birth": ("place of birth",),
+    "Address": ("address",),
+    "Address Country": ("address",),
+    "Address City": ("address",),
+    "Mobile Numbers": ("mobile", "phone"),
+    "Emails": ("e-mail", "email"),
+    "IELTS Score": ("ielts", "overall band"),
+    "IELTS Date": ("ielts", "test report form"),
+    "Name of Qualification": ("qualification", "certificate", "secondary"),
+    "School Name": ("school",),
+    "School region": ("school",),
+    "Dates attended": ("school", "graduat", "certificate"),
+}
+EXTRACTION_FIELDS = tuple(FIELD_KEYWORDS)
+
+TARGETED_CONTEXT_MIN_PAGES = int(os.environ.get("TARGETED_CONTEXT_MIN_PAGES", 3))
+# "page" sends every page with a hit; "block" only the hit blocks (smaller, riskier)
+TARGETED_CONTEXT_UNIT = os.environ.get("TARGETED_CONTEXT_UNIT", "page")
+context_stats = {"documents": 0, "targeted": 0, "chars_extracted": 0, "chars_sent": 0}
+
+
+def keyword_mask(text: str) -> int:
+    mask = 0
+    for match in _KEYWORD_RE.finditer(text):
+        mask |= 1 << int(match.lastgroup[1:])
+    return mask
+
+
+class PageIndex:
+    """Compact keyword index over the layout blocks of an extracted PDF.
+
+    Each block is stored as `(page_number, block_number, mask)` where `mask` is
+    a bitmask over INDEX_KEYWORDS, so the index costs a few ints per block.
+    """
+
+    def __init__(self, pages: List[List[str]]):
+        self.pages = pages
+        self.blocks = [
+            (page_number, block_number, keyword_mask(text))
+            for page_number, blocks in enumerate(pages, start=1)
+            for block_number, text in enumerate(blocks)
+        ]
+
+    def block_text(self, i: int) -> str:
+        page_number, block_number, _ = self.blocks[i]
+        return self.pages[page_number - 1][block_number]
+
+    def context_for(self, fields, unit: str = "page") -> Optional[str]:
+        """Text of every page (or block) with a hit for the fields, or None if one cannot be located.
+
+        A keyword hit does not guarantee the value is there ("IELTS required" on a
+        cover sheet), so all hits are kept rather than one per field.
+        """
+        wanted = 0
+        for field in fields:
+            if field not in FIELD_KEYWORDS:
+                return None
+            field_bits = sum(_KEYWORD_BITS[k] for k in FIELD_KEYWORDS[field])
+            if not any(mask & field_bits for _, _, mask in self.blocks):
+                return None
+            wanted |= field_bits
+
+        if unit == "page":
+            pages = sorted({page_number for page_number, _, mask in self.blocks if mask & wanted})
+            return "\n".join("\n".join(self.pages[page_number - 1]) for page_number in pages)
+
+        selected = set()
+        for i, (page_number, _, mask) in enumerate(self.blocks):
+            if mask & wanted:
+                selected.add(i)
+                # Labels usually precede their values, so keep the block that follows each hit
+                if i + 1 < len(self.blocks) and self.blocks[i + 1][0] == page_number:
+                    selected.add(i + 1)
+        return "\n".join(self.block_text(i) for i in sorted(selected))
+
+
+def build_prompt_context(pages: List[List[str]]) -> str:
+    """Raw text to send to Claude: the indexed blocks for long documents, else everything"""
+    raw_text = pages_to_text(pages)
+    context = None
+    if len(pages) >= TARGETED_CONTEXT_MIN_PAGES:
+        context = PageIndex(pages).context_for(EXTRACTION_FIELDS, TARGETED_CONTEXT_UNIT)
+
+    context_stats["documents"] += 1
+    context_stats["chars_extracted"] += len(raw_text)
+    if context is None or len(context) >= len(raw_text):
+        context_stats["chars_sent"] += len(raw_text)
+        return raw_text
+
+    context_stats["targeted"] += 1
+    context_stats["chars_sent"] += len(context)
+    logger.info(f"Targeted context: {len(context)} of {len(raw_text)} chars from {len(pages)} pages")
+    return context
+
+
 async def call_claude_api(cleaned_text: str, api_key: str):
     """Call Claude API to extract student information"""
-    client = anthropic.Anthropic(api_key=api_key)
+    anthropic = load_module("anthropic")
+    client = anthropic.AsyncAnthropic(api_key=api_key)
     prompt = f"""
 You are a data extraction assistant. 
 Note1:Dates attended should be like EX:jun 23-sep 24
@@ -86,7 +541,7 @@ Text:
 Return only JSON.
 """
     try:
-        response = client.messages.create(
+        response = await client.messages.create(
             model="claude-3-5-sonnet-20241022",
             max_tokens=1000,
             temperature=0.2,
@@ -120,8 +575,299 @@ def parse_student_info(json_response: str):
         raise HTTPException(status_code=400, detail=f"JSON Parse Error: {str(e)}")
 
 
+# === Browser profile ===
+# New contexts start from a stored storage_state template (captured before any
+# student data is typed, session cookies stripped) and share an on-disk cache of
+# Formstack's static assets.
+BROWSER_CACHE_DIR = Path(os.environ.get("BROWSER_CACHE_DIR", os.path.join(tempfile.gettempdir(), "formstack_cache")))
+STORAGE_STATE_PATH = BROWSER_CACHE_DIR / "storage_state.json"
+STORAGE_STATE_TTL = 12 * 3600
+ASSET_CACHE_TTL = 24 * 3600  # upper bound, even if the server allows longer
+ASSET_CACHE_MAX_BYTES = int(os.environ.get("ASSET_CACHE_MAX_BYTES", 200 * 1024 * 1024))
+CACHEABLE_RESOURCES = {"script", "stylesheet", "font", "image"}
+# Describe the body we hold, not the one originally sent over the wire
+_UNCACHED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "set-cookie"}
+# Cookies that tie a context to a Formstack session must not be shared between students
+_SESSION_COOKIE_RE = re.compile(r"sess|sid|token|auth|csrf|xsrf|resume|form", re.IGNORECASE)
+
+# Only these URLs are routed through Python; documents, XHRs and form posts go straight out
+STATIC_ASSET_URL_RE = re.compile(r"\.(?:js|css|woff2?|ttf|otf|eot|png|jpe?g|gif|svg|webp|ico)(?:[?#]|$)", re.IGNORECASE)
+
+# Kept apart for cold (template saved) and warm (template reused) runs, so the gain shows
+browser_stats = {
+    profile: {
+        "submissions": 0,
+        "asset_cache_hits": 0,
+        "asset_cache_misses": 0,
+        "bytes_from_cache": 0,
+        "bytes_from_network": 0,
+    }
+    for profile in ("cold", "warm")
+}
+time_to_first_field = {"cold": deque(maxlen=50), "warm": deque(maxlen=50)}
+
+
+def is_fresh(path: Path, ttl: float) -> bool:
+    try:
+        return time.time() - path.stat().st_mtime < ttl
+    except OSError:
+        return False
+
+
+def asset_expiry(status: int, headers: Dict[str, str], now: float) -> Optional[float]:
+    """When a response may be reused until, or None if it must not be cached.
+
+    Only explicitly cacheable, shared, non-varying responses are kept, so dynamic
+    or per-session assets (which rarely send max-age) always go to the network.
+    """
+    headers = {k.lower(): v for k, v in headers.items()}
+    if status != 200 or "set-cookie" in headers:
+        return None
+    vary = {v.strip().lower() for v in headers.get("vary", "").split(",") if v.strip()}
+    if vary - {"accept-encoding"}:
+        return None
+
+    cache_control = {}
+    for directive in headers.get("cache-control", "").lower().split(","):
+        name, _, value = directive.strip().partition("=")
+        cache_control[name] = value.strip('"')
+    if cache_control.keys() & {"no-store", "no-cache", "private"}:
+        return None
+
+    for directive in ("s-maxage", "max-age"):
+        if directive in cache_control:
+            try:
+                max_age = int(cache_control[directive])
+            except ValueError:
+                return None
+            break
+    else:
+        return None
+    if max_age <= 0:
+        return None
+    return now + min(max_age, ASSET_CACHE_TTL)
+
+
+class AssetCache:
+    """Serve static GET responses from disk, shared by every browser context"""
+
+    def __init__(self, directory: Path):
+        self.directory = directory / "assets"
+
+    async def handle(self, route, stats: Dict[str, int]):
+        request = route.request
+        if request.method != "GET" or request.resource_type not in CACHEABLE_RESOURCES:
+            await route.fallback()
+            return
+
+        key = hashlib.sha256(request.url.encode()).hexdigest()
+        body_path = self.directory / key
+        meta_path = self.directory / f"{key}.json"
+        try:
+            meta = json.loads(meta_path.read_text())
+            if meta["expires_at"] > time.time():
+                body = body_path.read_bytes()
+                stats["asset_cache_hits"] += 1
+                stats["bytes_from_cache"] += len(body)
+                await route.fulfill(status=meta["status"], headers=meta["headers"], body=body)
+                return
+        except (OSError, ValueError, KeyError):
+            pass
+
+        try:
+            response = await route.fetch()
+            body = await response.body()
+        except Exception as e:
+            # Let the browser make (and fail) the request itself rather than leave it hanging
+            logger.warning(f"Asset fetch failed for {request.url}: {e}")
+            await route.fallback()
+            return
+
+        stats["asset_cache_misses"] += 1
+        stats["bytes_from_network"] += len(body)
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in _UNCACHED_HEADERS}
+        expires_at = asset_expiry(response.status, response.headers, time.time())
+        if expires_at is not None:
+            try:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                self._write(body_path, body)
+                self._write(meta_path, json.dumps(
+                    {"status": response.status, "headers": headers, "expires_at": expires_at}
+                ).encode())
+            except OSError as e:
+                logger.warning(f"Could not cache {request.url}: {e}")
+        await route.fulfill(status=response.status, headers=headers, body=body)
+
+    @staticmethod
+    def _write(path: Path, data: bytes):
+        tmp_path = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+    def prune(self):
+        """Drop expired entries and leftovers, then the oldest entries above ASSET_CACHE_MAX_BYTES"""
+        if not self.directory.exists():
+            return
+        now = time.time()
+        entries = []
+        for meta_path in self.directory.glob("*.json"):
+            body_path = meta_path.with_suffix("")
+            try:
+                expires_at = json.loads(meta_path.read_text())["expires_at"]
+                stat = body_path.stat()
+            except (OSError, ValueError, KeyError):
+                expires_at, stat = 0, None
+            if expires_at <= now:
+                meta_path.unlink(missing_ok=True)
+                body_path.unlink(missing_ok=True)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, meta_path, body_path))
+
+        # Bodies without metadata and temp files from interrupted writes
+        for path in self.directory.iterdir():
+            if path.suffix not in ("", ".json") or (path.suffix == "" and not path.with_suffix(".json").exists()):
+                if is_fresh(path, 60):
+                    continue  # possibly being written right now
+                path.unlink(missing_ok=True)
+
+        total = sum(size for _, size, _, _ in entries)
+        for _, size, meta_path, body_path in sorted(entries, key=lambda entry: entry[0]):
+            if total <= ASSET_CACHE_MAX_BYTES:
+                break
+            meta_path.unlink(missing_ok=True)
+            body_path.unlink(missing_ok=True)
+            total -= size
+
+
+asset_cache = AssetCache(BROWSER_CACHE_DIR)
+
+
+def template_storage_state(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Keep only non-identifying state: persistent, non-session cookies and no localStorage"""
+    cookies = [
+        cookie for cookie in state.get("cookies", [])
+        if cookie.get("expires", -1) > 0 and not _SESSION_COOKIE_RE.search(cookie.get("name", ""))
+    ]
+    return {"cookies": cookies, "origins": []}
+
+
+async def save_storage_state_template(context):
+    """Store the context's non-identifying state as the template for later submissions"""
+    try:
+        state = template_storage_state(await context.storage_state())
+        BROWSER_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_path = STORAGE_STATE_PATH.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        tmp_path.write_text(json.dumps(state))
+        os.replace(tmp_path, STORAGE_STATE_PATH)
+    except Exception as e:
+        logger.warning(f"Could not save storage state template: {e}")
+
+
+def browser_metrics() -> Dict[str, Any]:
+    metrics = {}
+    for profile, stats in browser_stats.items():
+        recent = list(time_to_first_field[profile])
+        metrics[profile] = {
+            **stats,
+            "avg_time_to_first_field": round(sum(recent) / len(recent), 3) if recent else None,
+            "last_time_to_first_field": recent[-1] if recent else None,
+        }
+    return metrics
+
+
+# === Form waits ===
+class AdaptiveWaits:
+    """Event-driven waits whose timeouts are learned per step from recent latencies.
+
+    A step gets DEFAULT_MS until it has MIN_SAMPLES latencies, then HEADROOM x its
+    recent p95 (clamped). A wait that overruns its learned timeout is retried up to
+    MAX_MS before failing. MAX_MS defaults to the old fixed 10s, so a missing
+    selector fails no later, and a slow page no sooner, than before.
+    """
+
+    DEFAULT_MS = 10000
+    MIN_MS = 2000
+    MAX_MS = int(os.environ.get("FORM_WAIT_MAX_MS", 10000))
+    HEADROOM = 3
+    MIN_SAMPLES = 5
+
+    def __init__(self, window: int = 20):
+        self.latencies = defaultdict(lambda: deque(maxlen=window))
+        self.fixed_sleeps = 0
+
+    def timeout_for(self, step: str) -> float:
+        samples = sorted(self.latencies[step])
+        if len(samples) < self.MIN_SAMPLES:
+            return self.DEFAULT_MS
+        p95 = samples[int(0.95 * (len(samples) - 1))]
+        return min(max(p95 * self.HEADROOM, self.MIN_MS), self.MAX_MS)
+
+    async def _timed(self, step: str, wait):
+        """Run `wait(timeout_ms)`, extending once to MAX_MS if the learned timeout is too tight"""
+        timeout_error = load_module("playwright.async_api").TimeoutError
+        timeout = self.timeout_for(step)
+        start = time.perf_counter()
+        try:
+            await wait(timeout)
+        except timeout_error:
+            if timeout >= self.MAX_MS:
+                raise
+            logger.warning(f"Performance: step {step} exceeded its learned {timeout:.0f}ms timeout")
+            await wait(self.MAX_MS - timeout)
+        self.latencies[step].append((time.perf_counter() - start) * 1000)
+
+    async def wait_for_selector(self, page, selector: str, state: str = "visible"):
+        await self._timed(selector, lambda timeout: page.wait_for_selector(selector, state=state, timeout=timeout))
+
+    async def wait_until_stable(self, locator, step: str):
+        """Wait for an element to be visible and stop moving (dialog animations)"""
+        async def wait(timeout):
+            start = time.perf_counter()
+            await locator.wait_for(state="visible", timeout=timeout)
+            remaining = max(timeout - (time.perf_counter() - start) * 1000, 100)
+            if not await locator.evaluate(_WAIT_FOR_STABLE_BOX_JS, remaining):
+                timeout_error = load_module("playwright.async_api").TimeoutError
+                raise timeout_error(f"{step}: element still moving after {timeout:.0f}ms")
+
+        await self._timed(step, wait)
+
+    def watch_fixed_sleeps(self, page):
+        """Log every page.wait_for_timeout() as a performance warning"""
+        sleep = page.wait_for_timeout
+
+        async def wait_for_timeout(timeout):
+            caller = traceback.extract_stack(limit=2)[0]
+            self.fixed_sleeps += 1
+            logger.warning(f"Performance: fixed {timeout}ms sleep at {caller.filename}:{caller.lineno}")
+            await sleep(timeout)
+
+        page.wait_for_timeout = wait_for_timeout
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "fixed_sleeps": self.fixed_sleeps,
+            "timeouts_ms": {step: round(self.timeout_for(step)) for step in self.latencies},
+        }
+
+
+# Resolves true once the element's bounding box is unchanged across two animation
+# frames, or false after `timeout` ms so a never-settling element cannot hang the run
+_WAIT_FOR_STABLE_BOX_JS = """(el, timeout) => new Promise(resolve => {
+    let last = null;
+    const timer = setTimeout(() => resolve(false), timeout);
+    const check = () => {
+        const box = JSON.stringify(el.getBoundingClientRect());
+        if (box === last) { clearTimeout(timer); resolve(true); } else { last = box; requestAnimationFrame(check); }
+    };
+    requestAnimationFrame(check);
+})"""
+
+form_waits = AdaptiveWaits()
+
+
 async def fill_form_async(data: dict, agent_name: str):
     """Fill form using Playwright with proper error handling"""
+    started = time.perf_counter()
     try:
         async with async_playwright() as p:
             # Launch browser with proper configuration for server environment
@@ -139,12 +885,20 @@ async def fill_form_async(data: dict, agent_name: str):
                 ]
             )
 
+            # Fresh context per submission, so no form data carries over between students
+            warm_state = is_fresh(STORAGE_STATE_PATH, STORAGE_STATE_TTL)
             context = await browser.new_context(
                 viewport={'width': 1280, 'height': 720},
-                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+                storage_state=str(STORAGE_STATE_PATH) if warm_state else None
             )
+            profile = "warm" if warm_state else "cold"
+            run_stats = browser_stats[profile]
+            await context.route(STATIC_ASSET_URL_RE, lambda route: asset_cache.handle(route, run_stats))
+            run_stats["submissions"] += 1
 
             page = await context.new_page()
+            form_waits.watch_fixed_sleeps(page)
 
             # Add console logging for debugging
             page.on("console", lambda msg: logger.info(f"Browser console: {msg.text}"))
@@ -154,61 +908,65 @@ async def fill_form_async(data: dict, agent_name: str):
                 logger.info("Navigating to form...")
                 await page.goto(
                     "https://kicpathways.formstack.com/forms/uk_application_combined",
-                    wait_until="networkidle",
+                    wait_until="domcontentloaded",  # the first field wait below marks the form as ready
                     timeout=60000  # Increased timeout
                 )
 
-                 logger.info("Filling first page...")
+                logger.info("Filling first page...")
                 # First page
-                await page.wait_for_selector("#field167775915_3", timeout=10000)
+                await form_waits.wait_for_selector(page, "#field167775915_3")
+                time_to_first_field[profile].append(round(time.perf_counter() - started, 3))
+                if not warm_state:
+                    # Nothing has been typed yet, so the template holds no student data
+                    await save_storage_state_template(context)
                 await page.click("#field167775915_3")
 
-                await page.wait_for_selector("#field167775918", timeout=10000)
+                await form_waits.wait_for_selector(page, "#field167775918")
                 await page.fill("#field167775918", "UK Education Services")
                 await page.fill("#field167775919","Greater London")
-                await page.wait_for_selector("#field167775921-first", timeout=10000)
+                await form_waits.wait_for_selector(page, "#field167775921-first")
                 await page.fill("#field167775921-first", agent_name)
 
-                await page.wait_for_selector("#field167775921-last", timeout=10000)
+                await form_waits.wait_for_selector(page, "#field167775921-last")
                 await page.fill("#field167775921-last", ".")
 
-                await page.wait_for_selector("#field167775922", timeout=10000)
+                await form_waits.wait_for_selector(page, "#field167775922")
                 await page.fill("#field167775922", f"{agent_name}@ukeducationservices.com")
 
                 await page.select_option("#field167775920", index=202)
 
-                await page.wait_for_selector("#field167775936", timeout=10000)
+                await form_waits.wait_for_selector(page, "#field167775936")
                 await page.fill("#field167775936", data.get("first_name", "") + " " + data.get("middle_name", ""))
 
-                await page.wait_for_selector("#field167775937", timeout=10000)
+                await form_waits.wait_for_selector(page, "#field167775937")
                 await page.fill("#field167775937", data.get("last_name", ""))
 
                 await page.select_option("#field167775938", data.get("nationality"))
 
-                await page.wait_for_selector("#field167775945", timeout=10000)
+                await form_waits.wait_for_selector(page, "#field167775945")
                 await page.fill("#field167775945", data.get("emails", ""))
 
-                await page.wait_for_selector("#field167775941_2", timeout=10000)
+                await form_waits.wait_for_selector(page, "#field167775941_2")
                 await page.click("#field167775941_2")
 
-                await page.wait_for_selector("#field167775943_2", timeout=10000)
+                await form_waits.wait_for_selector(page, "#field167775943_2")
                 await page.click("#field167775943_2")
                 # field167775943_2
 
                 # Click next button
-                await page.wait_for_selector("#fsNextButton5813211", timeout=10000)
+                await form_waits.wait_for_selector(page, "#fsNextButton5813211")
                 await page.click("#fsNextButton5813211")
 
                 logger.info("Filling second page...")
                 # Second page
 
-                await page.wait_for_selector("#field167776174", timeout=10000)
+                await form_waits.wait_for_selector(page, "#field167776174")
                 await page.fill("#field167776174", data.get("name_of_qualification", ""))
 
-                await page.wait_for_selector("#field167776176", timeout=10000)
+                await form_waits.wait_for_selector(page, "#field167776176")
                 await page.fill("#field167776176", data.get("school_name", ""))
 
-                await page.wait_for_selector("#field167776175", timeout=10000)
+                await form_waits.wait_for_selector(page, "#field167776175")
                 await page.fill("#field167776175", data.get("dates_attended", ""))
 
                 await page.select_option("#field167776177", data.get("school_region"))
@@ -218,18 +976,18 @@ async def fill_form_async(data: dict, agent_name: str):
                 else:
                     await page.click("#field167776190_1")
 
-                    await page.wait_for_selector("#field167776191_1", timeout=10000)
+                    await form_waits.wait_for_selector(page, "#field167776191_1")
                     await page.click("#field167776191_1")
 
-                await page.wait_for_selector("#fsNextButton5813211", timeout=10000)
+                await form_waits.wait_for_selector(page, "#fsNextButton5813211")
                 await page.click("#fsNextButton5813211")
 
                 logger.info("Filling third page...")
                 # Third page
-                await page.wait_for_selector("#field167776220", timeout=10000)
+                await form_waits.wait_for_selector(page, "#field167776220")
                 await page.fill("#field167776220", data.get("mobile_numbers", ""))
 
-                await page.wait_for_selector("#field167776218-\\*", timeout=10000)
+                await form_waits.wait_for_selector(page, "#field167776218-\\*")
                 await page.fill("#field167776218-\\*", data.get("date_of_birth"))
 
                 if data.get("gender") == "M":
@@ -245,10 +1003,10 @@ async def fill_form_async(data: dict, agent_name: str):
 
                 await page.select_option("#field167776233", data.get("address_country"))
 
-                await page.wait_for_selector("#field167776234", timeout=10000)
+                await form_waits.wait_for_selector(page, "#field167776234")
                 await page.fill("#field167776234", data.get("address", ""))
 
-                await page.wait_for_selector("#field167776236", timeout=10000)
+                await form_waits.wait_for_selector(page, "#field167776236")
                 await page.fill("#field167776236", data.get("address_city", ""))
 
                 await page.click("#field167776223_3")
@@ -261,27 +1019,20 @@ async def fill_form_async(data: dict, agent_name: str):
                 await page.click("#field167776268_2")
 
                 # Copy Link
-                await page.wait_for_selector("#fsForm5813211 > button", timeout=10000)
+                await form_waits.wait_for_selector(page, "#fsForm5813211 > button")
                 await page.click("#fsForm5813211 > button")
 
                 # Wait for dialog to appear and stabilize
                 await page.get_by_text("Save and get link").click()
-                await page.wait_for_timeout(500)  # Let animations finish
-
 
                 selector = 'body > div > form > div.fs-external-module__content.fs--grid-4-8 > div > main > div.fs-module-main__message.fs-module-main__message--initial.fs--mb0 > p:nth-child(3) > a'
-                await page.wait_for_selector(selector, timeout=10000)
-                element_text = await page.locator(selector).text_content()
+                link = page.locator(selector)
+                await form_waits.wait_until_stable(link, "save_link_dialog")
+                element_text = await link.text_content()
 
                 # Print the element text
                 print(f"Element text: {element_text}")
                 logger.info(f"Element text: {element_text}")
-                await page.wait_for_timeout(2000)
-
-                logger.info("Form filling completed successfully")
-                return {"status": "success", "message": "Form filled successfully", "element_text": element_text}
-
-                await page.wait_for_timeout(2000)
 
                 logger.info("Form filling completed successfully")
                 return {"status": "success", "message": "Form filled successfully", "element_text": element_text}
@@ -299,6 +1050,7 @@ async def fill_form_async(data: dict, agent_name: str):
 
             finally:
                 await browser.close()
+                await asyncio.to_thread(asset_cache.prune)
 
     except Exception as e:
         logger.error(f"Playwright error: {e}")
@@ -454,33 +1206,21 @@ async def home():
     </html>
     """
 
-@app.post("/extract")
-async def extract_info(
-        pdf_file: UploadFile = File(...),
-        api_key: str = Form(...),
-        agent_name: str = Form(...)
-):
-    """Extract student information from PDF"""
+async def run_extraction(content: bytes, api_key: str):
+    """Run the full PDF -> Claude -> JSON pipeline on uploaded bytes"""
     pdf_path = None
     try:
-        # Validate file type
-        if not pdf_file.filename.lower().endswith('.pdf'):
-            raise HTTPException(status_code=400, detail="Only PDF files are allowed")
-        
         # Save uploaded file temporarily
         with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-            content = await pdf_file.read()
             tmp.write(content)
             pdf_path = tmp.name
 
-        logger.info(f"Processing PDF: {pdf_file.filename}")
-        
         # Process PDF
-        raw_text = extract_text_from_pdf(pdf_path)
-        if not raw_text.strip():
+        pages = await asyncio.to_thread(extract_pages_from_pdf, pdf_path)
+        if not pages_to_text(pages).strip():
             raise HTTPException(status_code=400, detail="No text found in PDF file")
-            
-        no_arabic = remove_arabic_text(raw_text)
+
+        no_arabic = remove_arabic_text(build_prompt_context(pages))
         cleaned_text = clean_text(no_arabic)
 
         # Call Claude API
@@ -489,8 +1229,35 @@ async def extract_info(
             raise HTTPException(status_code=500, detail="No response from Claude API")
 
         # Parse response
-        student_data = parse_student_info(json_response)
-        
+        return parse_student_info(json_response)
+    finally:
+        # Clean up temporary file
+        if pdf_path and os.path.exists(pdf_path):
+            try:
+                os.unlink(pdf_path)
+            except:
+                pass
+
+
+@app.post("/extract")
+async def extract_info(
+        pdf_file: UploadFile = File(...),
+        api_key: str = Form(...),
+        agent_name: str = Form(...)
+):
+    """Extract student information from PDF"""
+    try:
+        # Validate file type
+        if not pdf_file.filename.lower().endswith('.pdf'):
+            raise HTTPException(status_code=400, detail="Only PDF files are allowed")
+
+        content = await pdf_file.read()
+        logger.info(f"Processing PDF: {pdf_file.filename}")
+
+        # Identical uploads (double clicks, two agents) share one pipeline run
+        key = extraction_key(content, api_key)
+        student_data = await extraction_flight.do(key, lambda: run_extraction(content, api_key))
+
         logger.info("Data extraction completed successfully")
         return student_data
 
@@ -499,13 +1266,6 @@ async def extract_info(
     except Exception as e:
         logger.error(f"Extraction error: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to process PDF: {str(e)}")
-    finally:
-        # Clean up temporary file
-        if pdf_path and os.path.exists(pdf_path):
-            try:
-                os.unlink(pdf_path)
-            except:
-                pass
 
 
 @app.post("/fill-form")
@@ -546,6 +1306,22 @@ async def health_check():
     return {"status": "healthy", "message": "API is running"}
 
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness endpoint: 503 until heavy modules are warm, or if one failed to import"""
+    if startup_profile["errors"]:
+        return JSONResponse(status_code=503, content={"status": "failed", "errors": startup_profile["errors"]})
+    if not startup_profile["ready"]:
+        return JSONResponse(status_code=503, content={"status": "warming_up"})
+    return {"status": "ready"}
+
+
+@app.get("/metrics")
+async def metrics():
+    """Per-worker counters"""
+    return {"single_flight": extraction_flight.stats, "startup": startup_profile, "prompt_context": context_stats, "browser": browser_metrics(), "form_waits": form_waits.metrics()}
+
+
 # === Testing Functions ===
 @app.post("/test-browser")
 async def test_browser():
@@ -565,7 +1341,6 @@ async def test_browser():
 )
             page = await browser.new_page()
             await page.goto("https://www.google.com")
-            await page.wait_for_timeout(3000)
             await browser.close()
             return {"status": "success", "message": "Browser test passed"}
     except Exception as e:
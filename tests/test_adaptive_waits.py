@@ -0,0 +1,108 @@
+import asyncio
+import types
+
+import pytest
+
+import main
+from main import AdaptiveWaits
+
+
+class FakeTimeoutError(Exception):
+    pass
+
+
+@pytest.fixture(autouse=True)
+def fake_playwright(monkeypatch):
+    fake = types.SimpleNamespace(TimeoutError=FakeTimeoutError)
+    monkeypatch.setattr(main, "load_module", lambda name: fake)
+
+
+class FakePage:
+    def __init__(self, fail_first=0):
+        self.timeouts = []
+        self.fail_first = fail_first
+
+    async def wait_for_selector(self, selector, state, timeout):
+        self.timeouts.append(timeout)
+        if len(self.timeouts) <= self.fail_first:
+            raise FakeTimeoutError(selector)
+
+    async def wait_for_timeout(self, timeout):
+        pass
+
+
+def test_default_timeout_until_enough_samples():
+    waits = AdaptiveWaits()
+    waits.latencies["#field"].extend([100] * (waits.MIN_SAMPLES - 1))
+
+    assert waits.timeout_for("#field") == waits.DEFAULT_MS
+
+
+def test_learned_timeout_is_clamped():
+    waits = AdaptiveWaits()
+    waits.latencies["fast"].extend([50] * 10)
+    waits.latencies["usual"].extend([1000] * 10)
+    waits.latencies["slow"].extend([20000] * 10)
+
+    assert waits.timeout_for("fast") == waits.MIN_MS
+    assert waits.timeout_for("usual") == 1000 * waits.HEADROOM
+    assert waits.timeout_for("slow") == waits.MAX_MS
+
+
+def test_overrun_is_retried_up_to_max():
+    waits = AdaptiveWaits()
+    waits.latencies["#field"].extend([1000] * 10)
+    page = FakePage(fail_first=1)
+
+    asyncio.run(waits.wait_for_selector(page, "#field"))
+
+    assert page.timeouts == [3000, waits.MAX_MS - 3000]
+
+
+def test_timeout_at_max_is_raised():
+    waits = AdaptiveWaits()
+    waits.latencies["#field"].extend([20000] * 10)
+
+    with pytest.raises(FakeTimeoutError):
+        asyncio.run(waits.wait_for_selector(FakePage(fail_first=1), "#field"))
+
+
+def test_unsettled_element_times_out_instead_of_hanging():
+    class Locator:
+        def __init__(self):
+            self.evaluate_args = []
+
+        async def wait_for(self, state, timeout):
+            pass
+
+        async def evaluate(self, expression, timeout):
+            self.evaluate_args.append(timeout)
+            return False  # the page-side timer fired before the box settled
+
+    waits = AdaptiveWaits()
+    locator = Locator()
+
+    with pytest.raises(FakeTimeoutError):
+        asyncio.run(waits.wait_until_stable(locator, "save_link_dialog"))
+    # The timeout is passed into the page, and a step at the cap is not retried
+    assert len(locator.evaluate_args) == 1
+    assert 0 < locator.evaluate_args[0] <= waits.MAX_MS
+
+
+def test_missing_selector_fails_at_the_old_cap():
+    waits = AdaptiveWaits()
+    page = FakePage(fail_first=2)
+
+    with pytest.raises(FakeTimeoutError):
+        asyncio.run(waits.wait_for_selector(page, "#missing"))
+    assert sum(page.timeouts) == 10000
+
+
+def test_fixed_sleeps_are_counted():
+    waits = AdaptiveWaits()
+    page = FakePage()
+    waits.watch_fixed_sleeps(page)
+
+    asyncio.run(page.wait_for_timeout(500))
+
+    assert waits.metrics()["fixed_sleeps"] == 1
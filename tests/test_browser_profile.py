@@ -0,0 +1,101 @@
+import asyncio
+import json
+import time
+import types
+
+import pytest
+
+import main
+from main import AssetCache, asset_expiry, template_storage_state
+
+
+@pytest.mark.parametrize("headers", [
+    {},
+    {"cache-control": "no-store, max-age=600"},
+    {"cache-control": "no-cache, max-age=600"},
+    {"cache-control": "private, max-age=600"},
+    {"cache-control": "max-age=0"},
+    {"cache-control": "max-age=600", "vary": "Cookie"},
+    {"cache-control": "max-age=600", "set-cookie": "sid=1"},
+])
+def test_uncacheable_responses(headers):
+    assert asset_expiry(200, headers, now=0) is None
+
+
+def test_cacheable_response_expiry_is_capped():
+    assert asset_expiry(200, {"Cache-Control": "public, max-age=600", "Vary": "Accept-Encoding"}, now=0) == 600
+    assert asset_expiry(200, {"cache-control": "max-age=31536000"}, now=0) == main.ASSET_CACHE_TTL
+    assert asset_expiry(404, {"cache-control": "max-age=600"}, now=0) is None
+
+
+def test_template_drops_session_state():
+    state = {
+        "cookies": [
+            {"name": "consent", "expires": 2000000000},
+            {"name": "PHPSESSID", "expires": 2000000000},
+            {"name": "fs_form_resume", "expires": 2000000000},
+            {"name": "lang", "expires": -1},
+        ],
+        "origins": [{"origin": "https://kicpathways.formstack.com", "localStorage": [{"name": "draft", "value": "x"}]}],
+    }
+
+    assert template_storage_state(state) == {"cookies": [{"name": "consent", "expires": 2000000000}], "origins": []}
+
+
+def test_prune_removes_expired_and_oversized_entries(tmp_path, monkeypatch):
+    cache = AssetCache(tmp_path)
+    cache.directory.mkdir()
+    now = time.time()
+    for key, expires_at, size in (("old", now - 1, 10), ("a", now + 60, 60), ("b", now + 60, 60)):
+        (cache.directory / key).write_bytes(b"x" * size)
+        (cache.directory / f"{key}.json").write_text(json.dumps({"status": 200, "headers": {}, "expires_at": expires_at}))
+    monkeypatch.setattr(main, "ASSET_CACHE_MAX_BYTES", 100)
+
+    cache.prune()
+
+    remaining = {p.name for p in cache.directory.iterdir()}
+    assert "old" not in remaining and "old.json" not in remaining
+    assert len(remaining) == 2  # one of a/b evicted to get under the size limit
+
+
+def test_failed_fetch_falls_back_instead_of_hanging(tmp_path):
+    calls = []
+
+    async def fetch():
+        raise RuntimeError("connection reset")
+
+    async def fallback():
+        calls.append("fallback")
+
+    route = types.SimpleNamespace(
+        request=types.SimpleNamespace(method="GET", resource_type="script", url="https://example.com/app.js"),
+        fetch=fetch,
+        fallback=fallback,
+    )
+
+    stats = dict(main.browser_stats["cold"])
+    asyncio.run(AssetCache(tmp_path).handle(route, stats))
+
+    assert calls == ["fallback"]
+    assert stats == main.browser_stats["cold"]  # nothing counted for a failed fetch
+
+
+@pytest.mark.parametrize("url, routed", [
+    ("https://kicpathways.formstack.com/forms/js.php?v=3", False),
+    ("https://static.formstack.com/forms/js/4/form.min.js?v=123", True),
+    ("https://static.formstack.com/css/form.css", True),
+    ("https://static.formstack.com/fonts/roboto.woff2#iefix", True),
+    ("https://kicpathways.formstack.com/forms/uk_application_combined", False),
+    ("https://kicpathways.formstack.com/forms/index.php", False),
+])
+def test_only_static_asset_urls_are_routed(url, routed):
+    assert bool(main.STATIC_ASSET_URL_RE.search(url)) is routed
+
+
+def test_metrics_keep_cold_and_warm_runs_apart(monkeypatch):
+    monkeypatch.setattr(main, "time_to_first_field", {"cold": [4.0], "warm": [1.0, 2.0]})
+
+    metrics = main.browser_metrics()
+
+    assert metrics["cold"]["avg_time_to_first_field"] == 4.0
+    assert metrics["warm"]["avg_time_to_first_field"] == 1.5
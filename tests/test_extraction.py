@@ -0,0 +1,64 @@
+import os
+import types
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+import pytest
+from fastapi import HTTPException
+
+import main
+
+
+class FakePdf:
+    def __init__(self, page_count, fail=False):
+        self.pages = [f"page {i}" for i in range(page_count)]
+        self.fail = fail
+
+    def __enter__(self):
+        if self.fail:
+            raise ValueError("not a PDF")
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+@pytest.fixture
+def fake_pdfplumber(monkeypatch):
+    pdf = {"page_count": 20, "fail": False}
+    fake = types.SimpleNamespace(open=lambda path: FakePdf(pdf["page_count"], pdf["fail"]))
+    monkeypatch.setattr(main, "load_module", lambda name: fake)
+    monkeypatch.setattr(main, "extract_page_blocks", lambda page: [page])
+    monkeypatch.setattr(main, "PARALLEL_MIN_PAGES", 12)
+    monkeypatch.setattr(main, "EXTRACTION_WORKERS", 2)
+    return pdf
+
+
+def test_broken_pool_is_replaced_and_falls_back(fake_pdfplumber, monkeypatch):
+    # A worker dying (here os._exit, in production an OOM kill) breaks the whole executor
+    broken = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+    with pytest.raises(Exception):
+        broken.submit(os._exit, 1).result()
+    monkeypatch.setattr(main, "_extraction_pool", broken)
+
+    pages = main.extract_pages_from_pdf("pack.pdf")
+
+    assert pages == [[f"page {i}"] for i in range(20)]
+    assert main._extraction_pool is None  # the next large PDF gets a fresh pool
+
+
+def test_pool_failure_is_not_blamed_on_the_file(fake_pdfplumber, monkeypatch):
+    def no_pool():
+        raise OSError("cannot spawn")
+
+    monkeypatch.setattr(main, "get_extraction_pool", no_pool)
+
+    assert len(main.extract_pages_from_pdf("pack.pdf")) == 20
+
+
+def test_unreadable_pdf_is_a_client_error(fake_pdfplumber):
+    fake_pdfplumber["fail"] = True
+
+    with pytest.raises(HTTPException) as excinfo:
+        main.extract_pages_from_pdf("pack.pdf")
+    assert excinfo.value.status_code == 400
@@ -0,0 +1,71 @@
+import pytest
+
+import main
+from main import INDEX_KEYWORDS, PageIndex, build_prompt_context, keyword_mask
+
+
+def bit(keyword):
+    return 1 << INDEX_KEYWORDS.index(keyword)
+
+
+PACK = [
+    ["Cover letter", "IELTS required for admission", "filler " * 80],
+    ["PASSPORT\nSurname ALGOAZ Given Names LEENA", "Sex F Nationality SAU", "Date of Birth 29 JUN 2004 Place of Birth RIYADH"],
+    ["Application form", "Address: 1 King Fahd Rd Riyadh", "Mobile: 0500000000 Email: leena@example.com"],
+    ["Test Report Form", "Candidate details", "Overall Band 6.5 Test date 12/06/2024"],
+    ["Secondary School Certificate", "Riyadh Girls School 2019-2022 graduated"],
+    ["Terms and conditions " * 80],
+]
+
+
+def test_keyword_mask_records_hits():
+    assert keyword_mask("Date of Birth and NATIONALITY") == bit("date of birth") | bit("nationality")
+    assert keyword_mask("nothing relevant") == 0
+
+
+@pytest.mark.parametrize("text", ["Chelmsford, Essex", "Middlesex University", "Unisex", "Homeschooling"])
+def test_keyword_mask_matches_whole_words_only(text):
+    assert keyword_mask(text) == 0
+
+
+def test_keyword_mask_allows_plurals_and_prefixes():
+    assert keyword_mask("Emails") == bit("email")
+    assert keyword_mask("Addresses") == bit("address")
+    assert keyword_mask("Graduation year") == bit("graduat")
+
+
+@pytest.mark.parametrize("text, keyword", [("İELTS", "ielts"), ("paſſport", "passport")])
+def test_keyword_mask_handles_non_ascii_case_folding(text, keyword):
+    assert keyword_mask(text) == bit(keyword)
+
+
+def test_page_context_keeps_every_page_with_a_hit():
+    context = PageIndex(PACK).context_for(main.EXTRACTION_FIELDS)
+
+    # The cover sheet's "IELTS required" does not replace the real test report form
+    assert "IELTS required" in context
+    assert "Overall Band 6.5" in context
+    assert "Date of Birth 29 JUN 2004" in context
+    assert "Terms and conditions" not in context
+
+
+def test_block_context_keeps_hits_and_following_block():
+    context = PageIndex(PACK).context_for(main.EXTRACTION_FIELDS, unit="block")
+
+    assert "Overall Band 6.5" in context
+    assert "Sex F Nationality SAU" in context
+    assert "Candidate details" in context  # follows the "Test Report Form" hit
+    assert "Terms and conditions" not in context
+
+
+def test_missing_field_falls_back_to_full_text():
+    assert PageIndex(PACK[:2]).context_for(main.EXTRACTION_FIELDS) is None
+    assert PageIndex(PACK).context_for(["Unknown field"]) is None
+
+
+def test_build_prompt_context_only_targets_long_documents():
+    short = PACK[1:3]
+    assert build_prompt_context(short) == main.pages_to_text(short)
+
+    context = build_prompt_context(PACK)
+    assert len(context) < len(main.pages_to_text(PACK))
@@ -0,0 +1,165 @@
+import asyncio
+import json
+import os
+import time
+import types
+
+import main
+from main import SingleFlight, extraction_key
+
+
+def test_concurrent_calls_share_one_computation(tmp_path):
+    flight = SingleFlight(tmp_path)
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.1)
+        return {"first_name": "Leena"}
+
+    async def run():
+        return await asyncio.gather(*(flight.do("k", compute) for _ in range(3)))
+
+    assert asyncio.run(run()) == [{"first_name": "Leena"}] * 3
+    assert calls == 1
+    assert flight.stats == {"computations": 1, "duplicates_suppressed": 2}
+
+
+def test_duplicate_during_claude_call_is_suppressed(tmp_path, monkeypatch):
+    # The Claude call must not block the loop, or the duplicate arrives after the leader finished
+    class Messages:
+        async def create(self, **kwargs):
+            await asyncio.sleep(0.3)
+            text = json.dumps({"First name": "Leena"})
+            return types.SimpleNamespace(content=[types.SimpleNamespace(text=text)])
+
+    fake_anthropic = types.SimpleNamespace(
+        AsyncAnthropic=lambda api_key: types.SimpleNamespace(messages=Messages())
+    )
+    real_load_module = main.load_module
+    monkeypatch.setattr(
+        main, "load_module", lambda name: fake_anthropic if name == "anthropic" else real_load_module(name)
+    )
+
+    def extract_pages(pdf_path):
+        time.sleep(0.05)
+        return [["Passport Date of Birth 29/06/2004"]]
+
+    monkeypatch.setattr(main, "extract_pages_from_pdf", extract_pages)
+    flight = SingleFlight(tmp_path)
+
+    async def run():
+        key = extraction_key(b"%PDF", "sk-test")
+        first = asyncio.create_task(flight.do(key, lambda: main.run_extraction(b"%PDF", "sk-test")))
+        await asyncio.sleep(0.15)
+        second = await flight.do(key, lambda: main.run_extraction(b"%PDF", "sk-test"))
+        return await first, second
+
+    first, second = asyncio.run(run())
+    assert first == second == {"first_name": "Leena"}
+    assert flight.stats == {"computations": 1, "duplicates_suppressed": 1}
+
+
+def test_failures_are_shared_and_not_cached(tmp_path):
+    flight = SingleFlight(tmp_path)
+
+    async def fail():
+        await asyncio.sleep(0.05)
+        raise ValueError("bad key")
+
+    async def run():
+        return await asyncio.gather(flight.do("k", fail), flight.do("k", fail), return_exceptions=True)
+
+    assert [type(r) for r in asyncio.run(run())] == [ValueError, ValueError]
+    assert asyncio.run(flight.do("k", lambda: asyncio.sleep(0, result="ok"))) == "ok"
+
+
+def test_result_is_shared_across_workers_then_deleted(tmp_path):
+    leader, follower = SingleFlight(tmp_path), SingleFlight(tmp_path)
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.2)
+        return {"first_name": "Leena"}
+
+    async def run():
+        first = asyncio.create_task(leader.do("k", compute))
+        await asyncio.sleep(0.05)
+        return await asyncio.gather(first, follower.do("k", compute))
+
+    assert asyncio.run(run()) == [{"first_name": "Leena"}] * 2
+    assert calls == 1
+    assert follower.stats["duplicates_suppressed"] == 1
+    # Nobody is waiting any more, so the student data is gone from disk
+    assert not list(tmp_path.glob("*.json"))
+    assert not list(tmp_path.glob("*.wait"))
+
+
+def test_sweep_removes_stale_files(tmp_path):
+    flight = SingleFlight(tmp_path)
+    stale = time.time() - flight.RESULT_TTL - 1
+    for name in ("a.lock", "a.json", "a.123.tmp", "a.x.wait"):
+        (tmp_path / name).write_text("")
+        os.utime(tmp_path / name, (stale, stale))
+    (tmp_path / "b.lock").write_text("")
+
+    flight.sweep()
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["b.lock"]
+
+
+def test_key_depends_on_content_and_api_key():
+    assert extraction_key(b"pdf", "key-1") == extraction_key(b"pdf", "key-1")
+    assert extraction_key(b"pdf", "key-1") != extraction_key(b"pdf", "key-2")
+    assert extraction_key(b"pdf", "key-1") != extraction_key(b"other", "key-1")
+
+
+def test_long_wait_survives_sweep(tmp_path, monkeypatch):
+    monkeypatch.setattr(SingleFlight, "RESULT_TTL", 0.5)
+    leader, follower = SingleFlight(tmp_path), SingleFlight(tmp_path)
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(1.5)
+        return {"first_name": "Leena"}
+
+    async def run():
+        first = asyncio.create_task(leader.do("k", compute))
+        await asyncio.sleep(0.05)
+        second = asyncio.create_task(follower.do("k", compute))
+        await asyncio.sleep(1.0)
+        leader.sweep()  # the follower's marker is older than RESULT_TTL but still wanted
+        return await asyncio.gather(first, second)
+
+    assert asyncio.run(run()) == [{"first_name": "Leena"}] * 2
+    assert calls == 1
+
+
+def test_follower_takes_over_when_leader_is_cancelled(tmp_path):
+    flight = SingleFlight(tmp_path)
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.2)
+        return {"first_name": "Leena"}
+
+    async def run():
+        leader = asyncio.create_task(flight.do("k", compute))
+        await asyncio.sleep(0.05)
+        follower = asyncio.create_task(flight.do("k", compute))
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        return await asyncio.gather(leader, follower, return_exceptions=True)
+
+    leader_result, follower_result = asyncio.run(run())
+    assert isinstance(leader_result, asyncio.CancelledError)
+    assert follower_result == {"first_name": "Leena"}
+    assert calls == 2
+    assert flight.stats["duplicates_suppressed"] == 0
@@ -0,0 +1,35 @@
+import asyncio
+
+import pytest
+
+import main
+
+
+@pytest.fixture
+def profile(monkeypatch):
+    profile = {"imports": {}, "errors": {}, "warmup_seconds": None, "ready": False}
+    monkeypatch.setattr(main, "startup_profile", profile)
+    monkeypatch.delenv("PRELOAD_HEAVY_IMPORTS", raising=False)
+    return profile
+
+
+def test_warm_up_reports_ready(monkeypatch, profile):
+    monkeypatch.setattr(main, "HEAVY_MODULES", ("json", "csv"))
+
+    asyncio.run(main.warm_up())
+
+    assert profile["ready"] is True
+    assert set(profile["imports"]) == {"json", "csv"}
+    assert asyncio.run(main.readiness_check()) == {"status": "ready"}
+
+
+def test_failed_import_keeps_readiness_down(monkeypatch, profile):
+    monkeypatch.setattr(main, "HEAVY_MODULES", ("missing_heavy_module", "json"))
+
+    asyncio.run(main.warm_up())
+
+    # The remaining modules are still preloaded
+    assert "json" in profile["imports"]
+    assert profile["ready"] is False
+    assert "missing_heavy_module" in profile["errors"]
+    assert asyncio.run(main.readiness_check()).status_code == 503